@@ -1,27 +1,211 @@
 # LOGOS AI Database Schema
 # Railway PostgreSQL Setup
 
+import asyncio
 import asyncpg
-import json
+import orjson
 import os
-from datetime import datetime, timedelta
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
 import uuid
 
+# How long a caller's loaded conversation context stays valid in-process
+CONTEXT_CACHE_TTL = 300  # seconds
+CONTEXT_CACHE_SIZE = 1024  # callers kept in memory at once
+
+# Only the newest sessions' full transcripts go into the VA prompt - older ones are
+# loaded as summaries only
+CONTEXT_TRANSCRIPT_SESSIONS = 3
+
+# Buffered message writes - flushed every interval or once the batch fills up
+MESSAGE_FLUSH_INTERVAL = 0.5  # seconds
+MESSAGE_FLUSH_BATCH = 100
+MESSAGE_FLUSH_RETRIES = 10  # consecutive failed flushes (~5s) before a batch is given up on
+
+# Failures where the same batch can simply be written again later
+TRANSIENT_DB_ERRORS = (
+    OSError,
+    asyncio.TimeoutError,
+    asyncpg.InterfaceError,
+    asyncpg.PostgresConnectionError,
+    asyncpg.TooManyConnectionsError,
+    asyncpg.CannotConnectNowError,
+)
+
+MESSAGE_COLUMNS = ['session_id', 'timestamp', 'speaker', 'content', 'deepgram_data']
+INSERT_MESSAGE_SQL = '''
+    INSERT INTO messages (session_id, timestamp, speaker, content, deepgram_data)
+    VALUES ($1, $2, $3, $4, $5)
+'''
+
+# Columns added to callers after the first release, backfilled on older databases
+CALLER_MIGRATION_COLUMNS = {
+    'preferred_name': 'VARCHAR(100)',
+    'age': 'INTEGER',
+    'background_info': "TEXT DEFAULT ''",
+    'primary_concerns': "TEXT DEFAULT ''",
+    'communication_tone': "VARCHAR(50) DEFAULT 'supportive'",
+    'communication_style': "VARCHAR(50) DEFAULT 'conversational'",
+    'safety_flags': "TEXT DEFAULT ''",
+    'risk_level': "VARCHAR(20) DEFAULT 'low'",
+    'treatment_goals': "TEXT DEFAULT ''",
+    'hgo_notes': "TEXT DEFAULT ''",
+}
+
+# Unique topics (max 10) from the 3 most recent sessions past the recent-20 window,
+# deduplicated in Postgres so only the final topic list crosses the wire. The offset must
+# count the same completed sessions as the recent window; untagged ones unnest to nothing
+OLDER_TOPICS_SQL = '''
+    ARRAY(
+        SELECT DISTINCT topic
+        FROM (
+            SELECT key_topics FROM sessions
+            WHERE caller_phone = $1 AND end_time IS NOT NULL
+            ORDER BY start_time DESC
+            OFFSET 20 LIMIT 3
+        ) o, unnest(o.key_topics) AS topic
+        ORDER BY topic
+        LIMIT 10
+    )'''
+
+# Summaries for the last 20 completed sessions, full transcripts only for the newest few
+RECENT_SESSIONS_SQL = f'''
+        SELECT r.session_id, r.start_time, t.full_transcript, r.summary, r.key_topics, r.session_number
+        FROM (
+            SELECT session_id, start_time, summary, key_topics, session_number,
+                   row_number() OVER (ORDER BY start_time DESC) AS recency
+            FROM sessions 
+            WHERE caller_phone = $1 AND end_time IS NOT NULL
+            ORDER BY start_time DESC 
+            LIMIT 20
+        ) r
+        LEFT JOIN LATERAL (
+            SELECT full_transcript FROM sessions WHERE session_id = r.session_id
+        ) t ON r.recency <= {CONTEXT_TRANSCRIPT_SESSIONS}'''
+
+# Hot queries - always sent as these exact strings, so asyncpg's per-connection
+# statement cache parses and plans each one once per pool connection
+HOT_QUERIES = {
+    # Upsert caller, open the new session and load conversation context in one round-trip
+    'call_setup': f'''
+    WITH up AS (
+        INSERT INTO callers (phone_number, last_call_date, total_calls)
+        VALUES ($1, NOW(), 1)
+        ON CONFLICT (phone_number) 
+        DO UPDATE SET 
+            last_call_date = NOW(),
+            total_calls = callers.total_calls + 1,
+            updated_at = NOW()
+        RETURNING *
+    ), sess AS (
+        -- session_number is the caller's denormalized total_calls, no counting query needed
+        INSERT INTO sessions (caller_phone, twilio_call_sid, session_number)
+        SELECT phone_number, $2, total_calls FROM up
+        RETURNING session_id, session_number
+    ), recent AS ({RECENT_SESSIONS_SQL}
+    ), older AS (
+        SELECT start_time, summary, session_number
+        FROM sessions 
+        WHERE caller_phone = $1 AND end_time IS NOT NULL
+        ORDER BY start_time DESC 
+        OFFSET 20 LIMIT 50
+    )
+    SELECT
+        (SELECT row_to_json(up) FROM up) AS caller,
+        sess.session_id,
+        sess.session_number,
+        -- $3 = false skips the context reads entirely (caller context already cached in-process)
+        CASE WHEN $3 THEN
+            (SELECT COALESCE(json_agg(r ORDER BY r.start_time DESC), '[]') FROM recent r)
+        END AS recent_sessions,
+        CASE WHEN $3 THEN
+            (SELECT COALESCE(json_agg(o ORDER BY o.start_time DESC), '[]') FROM older o)
+        END AS older_summaries,
+        CASE WHEN $3 THEN {OLDER_TOPICS_SQL} END AS older_topics
+    FROM sess
+    ''',
+    # Same JSON shape as call_setup's recent_sessions, so both context paths agree
+    'recent_sessions': f'''
+    SELECT COALESCE(json_agg(r ORDER BY r.start_time DESC), '[]')
+    FROM ({RECENT_SESSIONS_SQL}) r
+    ''',
+    'older_context': f'''
+    SELECT
+        (SELECT COALESCE(json_agg(o ORDER BY o.start_time DESC), '[]')
+         FROM (
+            SELECT start_time, summary, session_number
+            FROM sessions 
+            WHERE caller_phone = $1 AND end_time IS NOT NULL
+            ORDER BY start_time DESC 
+            OFFSET 20 LIMIT 50
+         ) o) AS older_summaries,
+        {OLDER_TOPICS_SQL} AS older_topics
+    ''',
+}
+
+class ExpiringLRU:
+    """Bounded in-process cache - entries expire after ttl seconds, least recently used go first when full"""
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # {key: (stored_at, value)}
+    
+    def get(self, key):
+        """Cached value for key, or None if missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] >= self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+    
+    def put(self, key, value):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    def pop(self, key):
+        self._entries.pop(key, None)
+    
+    def keys(self):
+        return list(self._entries)
+    
+    def clear(self):
+        self._entries.clear()
+
 class LogosDatabase:
     def __init__(self):
         # Railway provides DATABASE_URL automatically
         self.db_url = os.getenv('DATABASE_URL')
         self.pool = None
+        self._ctx_cache = ExpiringLRU(CONTEXT_CACHE_SIZE, CONTEXT_CACHE_TTL)  # {phone_number: context}
+        self._msg_buffer = []  # Pending message records, written with COPY by the flusher
+        self._msg_flush_lock = asyncio.Lock()
+        self._msg_batch_full = asyncio.Event()
+        self._msg_flush_failures = 0  # Consecutive transient flush failures
+        self._flush_task = None
+        self._closing = False
     
     async def connect(self):
         """Initialize database connection pool"""
+        # Pool sizing is tunable per deployment - each live call holds
+        # connections for caller setup and every stored utterance
         self.pool = await asyncpg.create_pool(
             self.db_url,
-            min_size=1,
-            max_size=10,
-            command_timeout=30
+            min_size=int(os.getenv('DB_POOL_MIN', '4')),
+            max_size=int(os.getenv('DB_POOL_MAX', '32')),
+            command_timeout=int(os.getenv('DB_COMMAND_TIMEOUT', '10')),
+            max_inactive_connection_lifetime=300,
+            # NOW() fills the TIMESTAMP columns in the session time zone - pin it to UTC
+            # so DB-stamped session times and app-stamped message times share one clock
+            server_settings={'timezone': 'UTC'}
         )
         await self.create_tables()
+        self._flush_task = asyncio.create_task(self._message_flusher())
     
     async def create_tables(self):
         """Create all required tables"""
@@ -52,18 +236,18 @@ class LogosDatabase:
                 )
             ''')
             
-            # Add new columns if they don't exist (for existing databases)
+            # Add new columns if they don't exist (for existing databases) - one
+            # catalog lookup, then ALTER only what is actually missing
             try:
-                await conn.execute('ALTER TABLE callers ADD COLUMN IF NOT EXISTS preferred_name VARCHAR(100)')
-                await conn.execute('ALTER TABLE callers ADD COLUMN IF NOT EXISTS age INTEGER')
-                await conn.execute('ALTER TABLE callers ADD COLUMN IF NOT EXISTS background_info TEXT DEFAULT \'\'')
-                await conn.execute('ALTER TABLE callers ADD COLUMN IF NOT EXISTS primary_concerns TEXT DEFAULT \'\'')
-                await conn.execute('ALTER TABLE callers ADD COLUMN IF NOT EXISTS communication_tone VARCHAR(50) DEFAULT \'supportive\'')
-                await conn.execute('ALTER TABLE callers ADD COLUMN IF NOT EXISTS communication_style VARCHAR(50) DEFAULT \'conversational\'')
-                await conn.execute('ALTER TABLE callers ADD COLUMN IF NOT EXISTS safety_flags TEXT DEFAULT \'\'')
-                await conn.execute('ALTER TABLE callers ADD COLUMN IF NOT EXISTS risk_level VARCHAR(20) DEFAULT \'low\'')
-                await conn.execute('ALTER TABLE callers ADD COLUMN IF NOT EXISTS treatment_goals TEXT DEFAULT \'\'')
-                await conn.execute('ALTER TABLE callers ADD COLUMN IF NOT EXISTS hgo_notes TEXT DEFAULT \'\'')
+                existing = {
+                    row['column_name'] for row in await conn.fetch('''
+                        SELECT column_name FROM information_schema.columns
+                        WHERE table_schema = current_schema() AND table_name = 'callers'
+                    ''')
+                }
+                for column, definition in CALLER_MIGRATION_COLUMNS.items():
+                    if column not in existing:
+                        await conn.execute(f'ALTER TABLE callers ADD COLUMN IF NOT EXISTS {column} {definition}')
             except Exception as e:
                 print(f"Note: Could not add new columns (may already exist): {e}")
             
@@ -103,110 +287,169 @@ class LogosDatabase:
             await conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_start_time ON sessions(start_time)')
             await conn.execute('CREATE INDEX IF NOT EXISTS idx_messages_session ON messages(session_id)')
             await conn.execute('CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp)')
+            # Completed sessions per caller, newest first - serves the context LIMIT 20 / OFFSET 20 reads.
+            # Only fixed-width columns are INCLUDEd: summary/key_topics are unbounded and would push
+            # index tuples past the btree size limit, so they (and full_transcript) come from the heap
+            await conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_sessions_caller_recent
+                ON sessions(caller_phone, start_time DESC)
+                INCLUDE (session_id, session_number)
+                WHERE end_time IS NOT NULL
+            ''')
+            # Paged session lists for the HGO dashboard
+            await conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_caller_created ON sessions(caller_phone, created_at DESC)')
             
             print("Database tables created successfully")
 
     async def get_or_create_caller(self, phone_number, call_sid):
         """Get caller profile or create new one. Returns caller data + loaded context."""
         async with self.pool.acquire() as conn:
-            # Get or create caller
-            caller = await conn.fetchrow('''
-                INSERT INTO callers (phone_number, last_call_date, total_calls)
-                VALUES ($1, NOW(), 1)
-                ON CONFLICT (phone_number) 
-                DO UPDATE SET 
-                    last_call_date = NOW(),
-                    total_calls = callers.total_calls + 1,
-                    updated_at = NOW()
-                RETURNING *
-            ''', phone_number)
+            # Reconnects within the cache TTL reuse the context already loaded for this caller
+            context = self._ctx_cache.get(phone_number)
             
-            # Create new session
-            session = await conn.fetchrow('''
-                INSERT INTO sessions (caller_phone, twilio_call_sid, session_number)
-                VALUES ($1, $2, $3)
-                RETURNING session_id, session_number
-            ''', phone_number, call_sid, caller['total_calls'])
+            # Caller upsert + new session (+ last 20 sessions / older summaries) in one round-trip
+            row = await conn.fetchrow(HOT_QUERIES['call_setup'], phone_number, call_sid, context is None)
             
-            # Load conversation context (last 20 sessions with full transcripts)
-            recent_context = await self.load_conversation_context(phone_number)
+            if context is None:
+                context = {
+                    'recent_sessions': orjson.loads(row['recent_sessions']),
+                    'older_summaries': orjson.loads(row['older_summaries']),
+                    'older_topics': list(row['older_topics'])
+                }
+                self._ctx_cache.put(phone_number, context)
             
             return {
-                'caller': dict(caller),
-                'session_id': session['session_id'],
-                'session_number': session['session_number'],
-                'context': recent_context
+                'caller': orjson.loads(row['caller']),
+                'session_id': row['session_id'],
+                'session_number': row['session_number'],
+                'context': context
             }
     
+    def invalidate_caller_context(self, phone_number):
+        """Drop cached context after a write that changes what the VA should remember"""
+        self._ctx_cache.pop(phone_number)
+    
     async def load_conversation_context(self, phone_number):
-        """Load conversation context for VA memory"""
+        """Load conversation context for VA memory (standalone - call setup loads it inline)"""
         async with self.pool.acquire() as conn:
-            # Get last 20 sessions with full transcripts
-            recent_sessions = await conn.fetch('''
-                SELECT session_id, start_time, full_transcript, summary, key_topics, session_number
-                FROM sessions 
-                WHERE caller_phone = $1 AND end_time IS NOT NULL
-                ORDER BY start_time DESC 
-                LIMIT 20
-            ''', phone_number)
+            # Get last 20 sessions (full transcripts for the newest CONTEXT_TRANSCRIPT_SESSIONS)
+            recent_sessions = await conn.fetchval(HOT_QUERIES['recent_sessions'], phone_number)
             
-            # Get older session summaries (21+)
-            older_summaries = await conn.fetch('''
-                SELECT start_time, summary, key_topics, session_number
-                FROM sessions 
-                WHERE caller_phone = $1 AND end_time IS NOT NULL
-                ORDER BY start_time DESC 
-                OFFSET 20 LIMIT 50
-            ''', phone_number)
+            # Get older session summaries (21+) and their deduplicated topics
+            older = await conn.fetchrow(HOT_QUERIES['older_context'], phone_number)
             
             return {
-                'recent_sessions': [dict(row) for row in recent_sessions],
-                'older_summaries': [dict(row) for row in older_summaries]
+                'recent_sessions': orjson.loads(recent_sessions),
+                'older_summaries': orjson.loads(older['older_summaries']),
+                'older_topics': list(older['older_topics'])
             }
     
     async def add_message(self, session_id, speaker, content, deepgram_data=None):
-        """Add message during conversation (non-blocking)"""
-        async with self.pool.acquire() as conn:
-            await conn.execute('''
-                INSERT INTO messages (session_id, speaker, content, deepgram_data)
-                VALUES ($1, $2, $3, $4)
-            ''', session_id, speaker, content, json.dumps(deepgram_data) if deepgram_data else None)
+        """Queue message during conversation (never waits on the database) - written in batches by the flusher"""
+        self._msg_buffer.append((
+            session_id,
+            # Utterance time, not flush time - transcripts are ordered by it. UTC, like the pool's NOW()
+            datetime.now(timezone.utc).replace(tzinfo=None),
+            speaker,
+            content,
+            orjson.dumps(deepgram_data).decode() if deepgram_data else None
+        ))
+        if len(self._msg_buffer) >= MESSAGE_FLUSH_BATCH:
+            self._msg_batch_full.set()
+    
+    async def flush_messages(self):
+        """Write all buffered messages in a single COPY"""
+        async with self._msg_flush_lock:
+            if not self._msg_buffer:
+                return
+            records, self._msg_buffer = self._msg_buffer, []
+            try:
+                async with self.pool.acquire() as conn:
+                    try:
+                        await conn.copy_records_to_table('messages', records=records, columns=MESSAGE_COLUMNS)
+                    except asyncpg.PostgresError as e:
+                        if isinstance(e, TRANSIENT_DB_ERRORS):
+                            raise
+                        # One bad row rejects the whole COPY - write row by row so only it is lost
+                        print(f"COPY of {len(records)} messages rejected ({e}), inserting row by row")
+                        await self._insert_messages(conn, records)
+            except TRANSIENT_DB_ERRORS as e:
+                self._msg_flush_failures += 1
+                if self._msg_flush_failures > MESSAGE_FLUSH_RETRIES:
+                    print(f"Dropping {len(records)} messages after {MESSAGE_FLUSH_RETRIES} failed flushes: {e}")
+                    self._msg_flush_failures = 0
+                else:
+                    # Back in front of anything queued since, so utterance order is kept
+                    self._msg_buffer[:0] = records
+                    print(f"Error flushing {len(records)} messages (attempt {self._msg_flush_failures}), will retry: {e}")
+                return
+            except Exception as e:
+                print(f"Error flushing {len(records)} messages: {e}")
+            self._msg_flush_failures = 0
+    
+    async def _insert_messages(self, conn, records):
+        """Insert records one at a time, skipping (and logging) rows Postgres rejects"""
+        for i, record in enumerate(records):
+            try:
+                await conn.execute(INSERT_MESSAGE_SQL, *record)
+            except TRANSIENT_DB_ERRORS:
+                # Leave only the rows not yet written for flush_messages to requeue
+                del records[:i]
+                raise
+            except asyncpg.PostgresError as e:
+                print(f"Dropping message for session {record[0]} ({record[2]}): {e}")
+    
+    async def _message_flusher(self):
+        """Background task: flush buffered messages periodically"""
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._msg_batch_full.wait(), timeout=MESSAGE_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._msg_batch_full.clear()
+            await self.flush_messages()
+    
+    async def close(self):
+        """Write out buffered messages and close the pool (server shutdown)"""
+        self._closing = True
+        if self._flush_task:
+            self._msg_batch_full.set()  # Wake the flusher for its last pass
+            await self._flush_task
+        await self.flush_messages()
+        if self._msg_buffer:
+            print(f"Shutting down with {len(self._msg_buffer)} unwritten messages")
+        await self.pool.close()
     
     async def end_session(self, session_id, summary=None, key_topics=None, mood=None):
         """End session and update with summary"""
+        # Make sure every buffered utterance is in the transcript
+        await self.flush_messages()
+        
         async with self.pool.acquire() as conn:
-            # Get all messages for full transcript
-            messages = await conn.fetch('''
-                SELECT speaker, content, timestamp 
-                FROM messages 
-                WHERE session_id = $1 
-                ORDER BY timestamp
-            ''', session_id)
-            
-            full_transcript = [
-                {
-                    'speaker': msg['speaker'],
-                    'content': msg['content'],
-                    'timestamp': msg['timestamp'].isoformat()
-                }
-                for msg in messages
-            ]
-            
-            # Calculate duration
-            start_time = await conn.fetchval('SELECT start_time FROM sessions WHERE session_id = $1', session_id)
-            duration = int((datetime.now() - start_time).total_seconds())
-            
-            # Update session
-            await conn.execute('''
+            # Postgres builds the transcript and duration itself - one statement,
+            # no message rows shipped to Python and back
+            caller_phone = await conn.fetchval('''
                 UPDATE sessions SET 
                     end_time = NOW(),
-                    duration_seconds = $2,
-                    full_transcript = $3,
-                    summary = $4,
-                    key_topics = $5,
-                    mood_detected = $6
+                    duration_seconds = EXTRACT(EPOCH FROM (NOW()::timestamp - start_time))::int,
+                    full_transcript = COALESCE((
+                        SELECT jsonb_agg(jsonb_build_object(
+                            'speaker', speaker,
+                            'content', content,
+                            'timestamp', timestamp
+                        ) ORDER BY timestamp)
+                        FROM messages
+                        WHERE session_id = $1
+                    ), '[]'::jsonb),
+                    summary = $2,
+                    key_topics = $3,
+                    mood_detected = $4
                 WHERE session_id = $1
-            ''', session_id, duration, json.dumps(full_transcript), summary, key_topics, mood)
+                RETURNING caller_phone
+            ''', session_id, summary, key_topics, mood)
+            
+            if caller_phone:
+                self.invalidate_caller_context(caller_phone)
             
             # Archive disabled - keep ALL transcripts for HGO access
             # await self.archive_old_transcripts(session_id)
@@ -241,6 +484,7 @@ class LogosDatabase:
                     updated_at = NOW()
                 WHERE phone_number = $1
             ''', phone_number, new_context_item)
+        self.invalidate_caller_context(phone_number)
     async def update_master_prompt(self, phone_number, master_prompt):
         """Update master prompt (HGO dashboard will use this)"""
         async with self.pool.acquire() as conn:
@@ -250,39 +494,39 @@ class LogosDatabase:
                     updated_at = NOW()
                 WHERE phone_number = $1
             ''', phone_number, master_prompt)
+        self.invalidate_caller_context(phone_number)
 
     async def get_caller_history(self, phone_number):
-        """Get all caller data for HGO dashboard"""
+        """Get all caller data for HGO dashboard, as a ready-to-send JSON string"""
         async with self.pool.acquire() as conn:
-            caller = await conn.fetchrow(
-                'SELECT * FROM callers WHERE phone_number = $1',
-                phone_number
-            )
-            
-            if not caller:
-                return None
-            
-            # Get all sessions with available data
-            sessions = await conn.fetch('''
-                SELECT s.*, 
-                       CASE 
-                           WHEN s.full_transcript IS NOT NULL THEN 'full'
-                           ELSE 'summary'
-                       END as transcript_type
-                FROM sessions s
-                WHERE s.caller_phone = $1 
-                ORDER BY s.start_time DESC
+            # Postgres builds the whole document - no per-row Python objects,
+            # and the HTTP layer can send the text without re-serializing
+            return await conn.fetchval('''
+                SELECT jsonb_build_object(
+                    'caller', to_jsonb(c),
+                    'sessions', COALESCE((
+                        SELECT jsonb_agg(
+                            to_jsonb(s) || jsonb_build_object(
+                                'transcript_type',
+                                CASE 
+                                    WHEN s.full_transcript IS NOT NULL THEN 'full'
+                                    ELSE 'summary'
+                                END
+                            )
+                            ORDER BY s.start_time DESC
+                        )
+                        FROM sessions s
+                        WHERE s.caller_phone = c.phone_number
+                    ), '[]'::jsonb)
+                )::text
+                FROM callers c
+                WHERE c.phone_number = $1
             ''', phone_number)
-            
-            return {
-                'caller': dict(caller),
-                'sessions': [dict(session) for session in sessions]
-            }
 
-    async def get_sessions_by_phone(self, phone_number):
+    async def get_sessions_by_phone(self, phone_number, limit=50, offset=0):
         """
         Used by /cleanup?action=list_sessions&phone=...
-        Returns basic info for all sessions for a given phone.
+        Returns basic info (Records) for one page of sessions for a given phone, newest first.
         """
         async with self.pool.acquire() as conn:
             rows = await conn.fetch(
@@ -295,8 +539,9 @@ class LogosDatabase:
                 FROM sessions
                 WHERE caller_phone = $1
                 ORDER BY created_at DESC
+                LIMIT $2 OFFSET $3
                 ''',
-                phone_number
+                phone_number, limit, offset
             )
         
         return rows
@@ -320,13 +565,9 @@ Recent conversations:"""
         if session['summary']:
             context_prompt += f"\n- Session {session['session_number']}: {session['summary']}"
     
-    # Add older context if available
-    if context_data['older_summaries']:
+    # Add older context if available (topics arrive unique and capped at 10)
+    if context_data['older_topics']:
         context_prompt += f"\n\nEarlier topics discussed: "
-        topics = []
-        for summary in context_data['older_summaries'][:3]:
-            if summary['key_topics']:
-                topics.extend(summary['key_topics'])
-        context_prompt += ", ".join(list(set(topics))[:10])  # Unique topics, max 10
+        context_prompt += ", ".join(context_data['older_topics'])
     
     return context_prompt.strip()
@@ -1,16 +1,112 @@
 import asyncio
-import base64
+import contextlib
 import json
+import logging
+import logging.handlers
+import orjson
+import re
 import sys
 import websockets
 import os
+import queue
 import signal
 import time
+from collections import deque
 from aiohttp import web, WSMsgType
 from config import VOICE_AGENT_PERSONALITY, VOICE_MODEL, LLM_MODEL, LLM_TEMPERATURE
-from database import LogosDatabase, format_context_for_va
+from database import (
+    LogosDatabase, ExpiringLRU, format_context_for_va,
+    CONTEXT_TRANSCRIPT_SESSIONS, CONTEXT_CACHE_SIZE, CONTEXT_CACHE_TTL
+)
 from aiohttp_cors import setup as cors_setup, ResourceOptions
 
+try:
+    import pybase64  # SIMD base64 for media payloads
+except ImportError:
+    import base64 as pybase64  # same b64encode/b64decode API, just slower
+
+log = logging.getLogger("logos")
+
+# Twilio media frames start with the event name and carry a plain base64 payload
+MEDIA_PAYLOAD_RE = re.compile(r'\{"event":"media".*?"payload":"([^"]*)"')
+
+# Deepgram connection settings, resolved once - sts_connect() runs on every call
+DEEPGRAM_API_KEY = os.getenv('DEEPGRAM_API_KEY')
+STS_URL = "wss://agent.deepgram.com/v1/agent/converse"
+STS_CONNECT_KWARGS = {
+    "subprotocols": ["token", DEEPGRAM_API_KEY],
+    "compression": None,  # mulaw audio doesn't compress - skip permessage-deflate on every frame
+    # Bigger stream buffers let bursts of TTS frames be read / audio be written with fewer wakeups
+    "read_limit": 2 ** 18,
+    "write_limit": 2 ** 18,
+}
+
+# Upper bound for one coalesced audio frame to Deepgram (~2s of 8kHz mulaw) - keeps latency bounded
+DEEPGRAM_SEND_MAX_BYTES = 16 * 1024
+# Same bound for one coalesced media frame back to Twilio
+TWILIO_SEND_MAX_BYTES = 16 * 1024
+
+# Deepgram agent Settings message. Everything except the prompt is fixed, so it is
+# serialized once here and each call only JSON-encodes its own prompt between the halves
+SETTINGS_PROMPT_SENTINEL = "__LOGOS_AI_PROMPT__"
+SETTINGS_TEMPLATE = {
+    "type": "Settings",
+    "audio": {
+        "input": {
+            "encoding": "mulaw",
+            "sample_rate": 8000,
+        },
+        "output": {
+            "encoding": "mulaw",
+            "sample_rate": 8000,
+            "container": "none",
+        },
+    },
+    "agent": {
+        "language": "en",
+        "listen": {
+            "provider": {
+                "type": "deepgram",
+                "model": "nova-3"
+            }
+        },
+        "think": {
+            "provider": {
+                "type": "open_ai",
+                "model": LLM_MODEL,
+                "temperature": LLM_TEMPERATURE
+            },
+            "prompt": SETTINGS_PROMPT_SENTINEL
+        },
+        "speak": {
+            "provider": {
+                "type": "deepgram",
+                "model": VOICE_MODEL
+            }
+        },
+        "greeting": "Hello! How can I help you today?"
+    }
+}
+SETTINGS_JSON_PREFIX, SETTINGS_JSON_SUFFIX = json.dumps(SETTINGS_TEMPLATE).split(
+    json.dumps(SETTINGS_PROMPT_SENTINEL)
+)
+# First-time callers (and any call without history or guidance) get the base personality
+DEFAULT_SETTINGS_MESSAGE = SETTINGS_JSON_PREFIX + json.dumps(VOICE_AGENT_PERSONALITY) + SETTINGS_JSON_SUFFIX
+
+def build_settings_message(ai_prompt):
+    """Settings JSON for this call's prompt, reusing the fully prebuilt message when unchanged"""
+    if ai_prompt is VOICE_AGENT_PERSONALITY:
+        return DEFAULT_SETTINGS_MESSAGE
+    return SETTINGS_JSON_PREFIX + orjson.dumps(ai_prompt).decode() + SETTINGS_JSON_SUFFIX
+
+def is_user_started_speaking(message):
+    """True when a Deepgram text frame is the barge-in event, not just text mentioning it"""
+    try:
+        decoded = orjson.loads(message)
+    except orjson.JSONDecodeError:
+        return False
+    return isinstance(decoded, dict) and decoded.get('type') == 'UserStartedSpeaking'
+
 # Global variables
 shutdown_event = asyncio.Event()
 db = None  # Database instance
@@ -18,6 +114,20 @@ active_sessions = {}  # Store session data: {call_sid: session_data}
 inactive_clients = []  # Store ended calls for the dashboard
 dashboard_connections = set()  # Track dashboard WebSocket connections
 human_guidance_queue = {}  # Store guidance from human operators: {session_id: guidance_text}
+CONNECTING_SESSION_TTL = 300  # seconds a webhook-registered call may wait for its media stream
+ACTIVE_SESSION_MAX_AGE = 4 * 3600  # seconds before a session is treated as leaked
+# Prompt per caller: {caller_phone: (context_data, ai_prompt)} - sized and aged like the database's context cache
+va_context_cache = ExpiringLRU(CONTEXT_CACHE_SIZE, CONTEXT_CACHE_TTL)
+SESSION_LIST_CACHE_TTL = 60  # seconds
+SESSION_LIST_CACHE_SIZE = 256  # pages kept at once
+# Serialized list_sessions responses: {(phone, limit, offset): json_text}
+session_list_cache = ExpiringLRU(SESSION_LIST_CACHE_SIZE, SESSION_LIST_CACHE_TTL)
+
+def invalidate_session_list(phone):
+    """Drop cached list_sessions pages for a caller whose sessions changed"""
+    for key in session_list_cache.keys():
+        if key[0] == phone:
+            session_list_cache.pop(key)
 
 async def initialize_database():
     """Initialize database connection"""
@@ -34,16 +144,30 @@ async def initialize_database():
 
 def sts_connect():
     """Connect to Deepgram Voice Agent API"""
-    api_key = os.getenv('DEEPGRAM_API_KEY')
-    if not api_key:
+    if not DEEPGRAM_API_KEY:
         raise ValueError("DEEPGRAM_API_KEY environment variable is not set")
 
-    sts_ws = websockets.connect(
-        "wss://agent.deepgram.com/v1/agent/converse",
-        subprotocols=["token", api_key]
-    )
+    sts_ws = websockets.connect(STS_URL, **STS_CONNECT_KWARGS)
     return sts_ws
 
+@contextlib.asynccontextmanager
+async def sts_session(handshake):
+    """Finish a Deepgram handshake started earlier and close the connection on exit"""
+    sts_ws = await handshake
+    try:
+        yield sts_ws
+    finally:
+        await sts_ws.close()
+
+async def discard_sts_handshake(handshake):
+    """Cancel a Deepgram handshake that won't be used, closing the socket if it already opened"""
+    handshake.cancel()
+    try:
+        sts_ws = await handshake
+    except (asyncio.CancelledError, Exception):
+        return  # Never connected (or failed) - nothing to close
+    await sts_ws.close()
+
 async def broadcast_to_dashboards(message):
     """Send message to all connected dashboard clients"""
     if not dashboard_connections:
@@ -52,16 +176,43 @@ async def broadcast_to_dashboards(message):
     disconnected = set()
     for ws in dashboard_connections.copy():
         try:
-            await ws.send_str(json.dumps(message))
+            await ws.send_str(orjson.dumps(message).decode())
         except ConnectionResetError:
             disconnected.add(ws)
         except Exception as e:
-            print(f"Error broadcasting to dashboard: {e}")
+            log.error("Error broadcasting to dashboard: %s", e)
             disconnected.add(ws)
     
     # Remove disconnected clients
     dashboard_connections.difference_update(disconnected)
 
+async def prune_active_sessions():
+    """Background task: drop active_sessions entries whose call never finished cleanly"""
+    while True:
+        await asyncio.sleep(60)
+        try:
+            now = time.time()
+            stale = [
+                call_sid for call_sid, sess in active_sessions.items()
+                if now - sess['timestamp'] > (
+                    CONNECTING_SESSION_TTL if sess.get('status') == 'connecting' else ACTIVE_SESSION_MAX_AGE
+                )
+            ]
+            pruned = 0
+            for call_sid in stale:
+                # A stop event may have removed it while we were broadcasting
+                if active_sessions.pop(call_sid, None) is None:
+                    continue
+                pruned += 1
+                await broadcast_to_dashboards({
+                    'type': 'call_ended',
+                    'call_sid': call_sid
+                })
+            if pruned:
+                print(f"🧹 Pruned {pruned} stale sessions")
+        except Exception as e:
+            print(f"Error pruning active sessions: {e}")
+
 async def voice_webhook_handler(request):
     """Handle initial Twilio voice webhook and capture caller info"""
     try:
@@ -69,7 +220,7 @@ async def voice_webhook_handler(request):
         caller_phone = form_data.get('From', 'unknown')
         call_sid = form_data.get('CallSid', 'unknown')
         
-        print(f"🎯 Voice webhook: Call from {caller_phone}, CallSid: {call_sid}")
+        log.info("🎯 Voice webhook: Call from %s, CallSid: %s", caller_phone, call_sid)
         
         # Store caller info for WebSocket to retrieve
         active_sessions[call_sid] = {
@@ -90,7 +241,7 @@ async def voice_webhook_handler(request):
         host = request.host
         websocket_url = f"wss://{host}/twilio"
         
-        print(f"🔗 Connecting to WebSocket: {websocket_url}")
+        log.info("🔗 Connecting to WebSocket: %s", websocket_url)
         
         # Return EXACT same TwiML format as working version
         twiml_response = f'''<?xml version="1.0" encoding="UTF-8"?>
@@ -106,7 +257,7 @@ async def voice_webhook_handler(request):
         return web.Response(text=twiml_response, content_type='application/xml')
     
     except Exception as e:
-        print(f"Error in voice webhook: {e}")
+        log.error("Error in voice webhook: %s", e)
         # Fallback TwiML
         return web.Response(
             text='''<?xml version="1.0" encoding="UTF-8"?>
@@ -118,27 +269,28 @@ async def voice_webhook_handler(request):
 
 def format_actual_conversation_context(recent_sessions):
     """Format actual conversation content for AI context instead of generic summaries"""
-    print(f"🔍 DEBUG: Formatting context for {len(recent_sessions)} sessions")
+    log.debug("🔍 Formatting context for %d sessions", len(recent_sessions))
     
     context_parts = []
     
-    for i, session_data in enumerate(recent_sessions[-3:]):  # Last 3 sessions only
+    # Sessions arrive newest first and only the newest carry full transcripts
+    for i, session_data in enumerate(recent_sessions[:CONTEXT_TRANSCRIPT_SESSIONS]):  # Last 3 sessions only
         session_num = session_data.get('session_number', 'Unknown')
-        transcript = session_data.get('full_transcript', [])
+        transcript = session_data.get('full_transcript') or []
 
         # 🔧 STEP 1: if transcript is a JSON string, decode it first
         if isinstance(transcript, str):
             try:
-                decoded = json.loads(transcript)
+                decoded = orjson.loads(transcript)
                 # Some schemas store {"messages": [...]}
                 if isinstance(decoded, dict) and "messages" in decoded:
                     transcript = decoded["messages"]
                 else:
                     transcript = decoded
-                print(f"🔍 DEBUG: Decoded JSON transcript for session {session_num}, type={type(transcript)}")
-            except json.JSONDecodeError:
+                log.debug("🔍 Decoded JSON transcript for session %s, type=%s", session_num, type(transcript))
+            except orjson.JSONDecodeError:
                 # Fall back: treat whole thing as one user message
-                print(f"⚠️ WARNING: Could not JSON-decode transcript for session {session_num}, using raw string")
+                log.warning("⚠️ Could not JSON-decode transcript for session %s, using raw string", session_num)
                 transcript = [{"content": transcript, "speaker": "user"}]
 
         # 🔧 STEP 2: normalize into list[dict]
@@ -153,7 +305,7 @@ def format_actual_conversation_context(recent_sessions):
                 })
         transcript = normalized
         
-        print(f"🔍 DEBUG: Session {session_num} has {len(transcript) if transcript else 0} messages after normalization")
+        log.debug("🔍 Session %s has %d messages after normalization", session_num, len(transcript))
         
         if transcript:
             key_exchanges = []
@@ -161,7 +313,7 @@ def format_actual_conversation_context(recent_sessions):
                 content = msg.get('content', '').strip()
                 speaker = msg.get('speaker', '')
                 
-                print(f"🔍 DEBUG: Message {j}: {speaker} - {content[:50]}...")
+                log.debug("🔍 Message %d: %s - %s...", j, speaker, content[:50])
                 
                 # Skip generic greetings and very short responses
                 if len(content) > 15 and not content.startswith(
@@ -169,21 +321,21 @@ def format_actual_conversation_context(recent_sessions):
                 ):
                     if speaker == 'user':
                         key_exchanges.append(f"User said: \"{content}\"")
-                        print(f"🔍 DEBUG: Added user statement: {content[:30]}...")
+                        log.debug("🔍 Added user statement: %s...", content[:30])
                     elif speaker == 'ai' and (
                         'mentioned' in content or 'talked about' in content or 'remember' in content
                     ):
                         # Skip AI's generic memory claims that might be wrong
-                        print(f"🔍 DEBUG: Skipped AI memory claim: {content[:30]}...")
+                        log.debug("🔍 Skipped AI memory claim: %s...", content[:30])
                         continue
             
             if key_exchanges:
                 meaningful_exchanges = key_exchanges[-6:]  # Last 6 meaningful statements
                 session_summary = f"Session {session_num}: " + " | ".join(meaningful_exchanges)
                 context_parts.append(session_summary)
-                print(f"🔍 DEBUG: Session {session_num} summary: {len(meaningful_exchanges)} meaningful exchanges")
+                log.debug("🔍 Session %s summary: %d meaningful exchanges", session_num, len(meaningful_exchanges))
             else:
-                print(f"🔍 DEBUG: Session {session_num} had no meaningful exchanges")
+                log.debug("🔍 Session %s had no meaningful exchanges", session_num)
     
     if context_parts:
         full_context = f"""
@@ -192,11 +344,11 @@ ACTUAL CONVERSATION HISTORY:
 
 IMPORTANT: Only reference what the user actually said above. Do NOT make up details about hobbies, goals, or activities they never mentioned. If you're not sure about something from previous conversations, ask them to remind you rather than guessing."""
         
-        print(f"🔍 DEBUG: Final context length: {len(full_context)} characters")
-        print(f"🔍 DEBUG: Context preview: {full_context[:300]}...")
+        log.debug("🔍 Final context length: %d characters", len(full_context))
+        log.debug("🔍 Context preview: %s...", full_context[:300])
         return full_context
     
-    print(f"🔍 DEBUG: No meaningful context found")
+    log.debug("🔍 No meaningful context found")
     return ""
 
 
@@ -268,25 +420,25 @@ async def dashboard_websocket_handler(request):
         # Send current active sessions to new dashboard
         print(f"📤 Sending active sessions: {list(active_sessions.keys())}")
         if active_sessions:
-            await ws.send_str(json.dumps({
+            await ws.send_str(orjson.dumps({
                 'type': 'active_sessions',
                 'sessions': list(active_sessions.keys())
-            }))
+            }).decode())
 
         # Load inactive clients from database (always fresh data)
         db_inactive_clients = await load_inactive_clients_from_db()
         print(f"📤 Sending inactive clients: {len(db_inactive_clients)} clients from database")
-        await ws.send_str(json.dumps({
+        await ws.send_str(orjson.dumps({
             'type': 'inactive_clients',
             'clients': db_inactive_clients
-        }))
+        }).decode())
         
                
         # Handle incoming dashboard messages
         async for msg in ws:
             if msg.type == WSMsgType.TEXT:
                 try:
-                    data = json.loads(msg.data)
+                    data = orjson.loads(msg.data)
                     message_type = data.get('type')
                     
                     if message_type == 'human_guidance':
@@ -300,9 +452,9 @@ async def dashboard_websocket_handler(request):
                         print(f"👤 Human guidance received for session {session_id}: {guidance}")
                         
                     elif message_type == 'ping':
-                        await ws.send_str(json.dumps({'type': 'pong'}))
+                        await ws.send_str(orjson.dumps({'type': 'pong'}).decode())
                         
-                except json.JSONDecodeError:
+                except orjson.JSONDecodeError:
                     print(f"Invalid JSON from dashboard: {msg.data}")
                     
             elif msg.type == WSMsgType.ERROR:
@@ -1101,22 +1253,40 @@ async def bulk_cleanup_handler(request):
         
         elif action == 'list_sessions':
             if normalized_phone:
-                sessions = await db.get_sessions_by_phone(normalized_phone)
+                try:
+                    limit = int(params.get('limit', 50))
+                    offset = int(params.get('offset', 0))
+                except ValueError:
+                    return web.Response(text="limit and offset must be integers", status=400)
+                limit = min(max(limit, 1), 500)
+                offset = max(offset, 0)
+                cache_key = (normalized_phone, limit, offset)
+                
+                # Serve a recently built page as-is
+                cached = session_list_cache.get(cache_key)
+                if cached:
+                    return web.Response(text=cached, content_type='application/json')
+                
+                sessions = await db.get_sessions_by_phone(normalized_phone, limit, offset)
                 session_list = []
                 for session in sessions:
                     session_dict = {
-                        'session_id': str(session[0]),
-                        'caller_phone': session[1],
-                        'created_at': str(session[2]),
-                        'session_number': session[3]
+                        'session_id': str(session['session_id']),
+                        'caller_phone': session['caller_phone'],
+                        'created_at': str(session['created_at']),
+                        'session_number': session['session_number']
                     }
                     session_list.append(session_dict)
 
-                return web.json_response({
+                response_text = orjson.dumps({
                     'phone': normalized_phone,
                     'sessions': session_list,
-                    'count': len(session_list)
-                })
+                    'count': len(session_list),
+                    'limit': limit,
+                    'offset': offset
+                }).decode()
+                session_list_cache.put(cache_key, response_text)
+                return web.Response(text=response_text, content_type='application/json')
             else:
                 return web.Response(text="Phone parameter required for list_sessions", status=400)
 
@@ -1147,8 +1317,7 @@ async def bulk_cleanup_handler(request):
                     # Parse transcript
                     transcript = session['full_transcript']
                     if isinstance(transcript, str):
-                        import json
-                        transcript = json.loads(transcript)
+                        transcript = orjson.loads(transcript)
 
                     return web.json_response({
                         'session_id': str(session['session_id']),
@@ -1163,19 +1332,31 @@ async def bulk_cleanup_handler(request):
                 print(f"Error fetching session transcript: {e}")
                 return web.Response(text=f"Error: {str(e)}", status=500)
         
+        elif action == 'get_caller_history':
+            if normalized_phone:
+                history_json = await db.get_caller_history(normalized_phone)
+                if not history_json:
+                    return web.Response(text="Caller not found", status=404)
+                return web.Response(text=history_json, content_type='application/json')
+            else:
+                return web.Response(text="Phone parameter required for get_caller_history", status=400)
+        
         elif action == 'delete_old_sessions':
             deleted_count = await db.delete_old_sessions(days_old)
+            session_list_cache.clear()  # Any caller's cached pages may list deleted sessions
             return web.Response(text=f"Deleted {deleted_count} sessions older than {days_old} days")
         
         elif action == 'delete_phone_sessions':
             if normalized_phone:
                 deleted_count = await db.delete_sessions_by_phone(normalized_phone)
+                invalidate_session_list(normalized_phone)
                 return web.Response(text=f"Deleted {deleted_count} sessions for phone {normalized_phone}")
             else:
                 return web.Response(text="Phone parameter required for delete_phone_sessions", status=400)
         
         elif action == 'cleanup_empty_sessions':
             deleted_count = await db.cleanup_empty_sessions()
+            session_list_cache.clear()  # Any caller's cached pages may list deleted sessions
             return web.Response(text=f"Deleted {deleted_count} empty sessions (no messages)")
         
         else:
@@ -1183,7 +1364,8 @@ async def bulk_cleanup_handler(request):
 Available cleanup actions:
 - count_sessions?phone=PHONE - Count sessions for specific phone
 - count_sessions - Count all sessions  
-- list_sessions?phone=PHONE - List sessions for specific phone (JSON)
+- list_sessions?phone=PHONE&limit=N&offset=M - List sessions for specific phone (JSON, default limit 50)
+- get_caller_history?phone=PHONE - Caller profile with all sessions (JSON)
 - delete_old_sessions?days=N - Delete sessions older than N days (default 7)
 - delete_phone_sessions?phone=PHONE - Delete all sessions for specific phone
 - cleanup_empty_sessions - Delete sessions with no messages
@@ -1198,40 +1380,65 @@ Phone formats supported: +61412345678, 0412345678, 61412345678, 412345678
 
 async def websocket_handler(request):
     """Handle Twilio WebSocket connections for voice processing"""
-    ws = web.WebSocketResponse(protocols=['voice-bridge'])
+    # Media frames are base64 audio - never negotiate permessage-deflate with Twilio
+    ws = web.WebSocketResponse(protocols=['voice-bridge'], compress=False)
     await ws.prepare(request)
-    print("🔌 WebSocket connection established")
+    log.info("🔌 WebSocket connection established")
     
     # Initialize variables for this specific call
-    audio_queue = asyncio.Queue()
-    streamsid_queue = asyncio.Queue()
+    # Single producer (twilio_receiver) / single consumer (sts_sender) on one loop,
+    # so a plain deque + a Future the consumer parks on is enough for the audio hand-off
+    audio_queue = deque()
+    audio_waiter = None  # Future sts_sender is parked on while audio_queue is empty
+    streamsid_future = asyncio.get_running_loop().create_future()  # Set once by the start event
     session_id = None
     caller_context = None
     caller_phone = None
     call_sid = None
     
+    def push_audio(chunk):
+        """Queue audio for Deepgram and wake sts_sender if it is waiting"""
+        audio_queue.append(chunk)
+        if audio_waiter is not None and not audio_waiter.done():
+            audio_waiter.set_result(None)
+    
     # We'll wait for caller info from Twilio start event before configuring Deepgram
     caller_info_ready = asyncio.Event()
 
     try:
         async def twilio_receiver():
-            """Receive audio from Twilio and buffer for Deepgram"""
+            """Receive audio from Twilio and forward it to Deepgram"""
             nonlocal session_id, caller_phone, call_sid
-            print("📱 twilio_receiver started")
-            BUFFER_SIZE = 20 * 160  # Buffer 20 messages (0.4 seconds)
-            inbuffer = bytearray(b"")
+            log.debug("📱 twilio_receiver started")
+            # Bound once - these run for every 20ms media frame
+            match_media = MEDIA_PAYLOAD_RE.match
+            b64decode = pybase64.b64decode
+            
+            # No fixed buffering: every 20ms frame reaches Deepgram as soon as it arrives,
+            # and sts_sender merges whatever queues up while a send is in flight
+            def forward_audio(payload):
+                """Decode one media payload and hand it straight to sts_sender"""
+                push_audio(b64decode(payload, validate=False))
             
             try:
                 async for msg in ws:
                     if shutdown_event.is_set():
                         break
                         
-                    if msg.type == web.WSMsgType.TEXT:
+                    if msg.type is WSMsgType.TEXT:
                         try:
-                            data = json.loads(msg.data)
+                            # Fast path: media frames are ~50/s per call, pull the payload
+                            # straight out of the text without building the dict
+                            media_match = match_media(msg.data)
+                            if media_match:
+                                forward_audio(media_match.group(1))
+                                continue
                             
-                            if data["event"] == "start":
-                                print("🚀 Received Twilio start event")
+                            data = orjson.loads(msg.data)
+                            event = data.get("event")
+                            
+                            if event == "start":
+                                log.info("🚀 Received Twilio start event")
                                 start = data["start"]
                                 streamsid = start["streamSid"]
                                 actual_call_sid = start["callSid"]
@@ -1241,7 +1448,7 @@ async def websocket_handler(request):
                                 if custom_params:
                                     caller_phone = custom_params.get("caller", "unknown")
                                     call_sid = custom_params.get("callsid", actual_call_sid)
-                                    print(f"📱 Updated caller info from parameters: {caller_phone}")
+                                    log.debug("📱 Updated caller info from parameters: %s", caller_phone)
                                     
                                     # Signal that caller info is ready
                                     caller_info_ready.set()
@@ -1251,24 +1458,16 @@ async def websocket_handler(request):
                                         active_sessions[call_sid]['status'] = 'active'
                                     
                                                                     
-                                await streamsid_queue.put(streamsid)
-                                print(f"📨 StreamSid queued: {streamsid}")
-                                
-                            elif data["event"] == "media" and "media" in data:
-                                # Buffer audio data
-                                chunk = base64.b64decode(data["media"]["payload"])
-                                inbuffer.extend(chunk)
+                                if not streamsid_future.done():
+                                    streamsid_future.set_result(streamsid)
+                                log.info("📨 StreamSid queued: %s", streamsid)
                                 
-                                # Send to Deepgram when buffer is full
-                                if len(inbuffer) >= BUFFER_SIZE:
-                                    await audio_queue.put(bytes(inbuffer))
-                                    inbuffer.clear()
+                            elif event == "media" and "media" in data:
+                                # Forward audio data (media frame with an unexpected layout)
+                                forward_audio(data["media"]["payload"])
                                     
-                            elif data["event"] == "stop":
-                                print("🛑 Call ended by Twilio")
-                                # Send any remaining buffered audio
-                                if inbuffer:
-                                    await audio_queue.put(bytes(inbuffer))
+                            elif event == "stop":
+                                log.info("🛑 Call ended by Twilio")
                                                               
                                 # Move call from active to inactive list and notify dashboards
                                 if call_sid:
@@ -1317,196 +1516,272 @@ async def websocket_handler(request):
                                     })
 
                                 
-                        except json.JSONDecodeError as e:
-                            print(f"Failed to decode JSON: {e}")
+                        except orjson.JSONDecodeError as e:
+                            log.error("Failed to decode JSON: %s", e)
                         except Exception as e:
-                            print(f"Error processing Twilio message: {e}")
+                            log.error("Error processing Twilio message: %s", e)
                     
-                    elif msg.type == web.WSMsgType.ERROR:
-                        print(f"WebSocket error: {msg.data}")
+                    elif msg.type is WSMsgType.ERROR:
+                        log.error("WebSocket error: %s", msg.data)
                         break
                         
             except Exception as e:
-                print(f"Error in twilio_receiver: {e}")
+                log.error("Error in twilio_receiver: %s", e)
 
         # Start Twilio receiver first to get caller info
-        twilio_task = asyncio.create_task(twilio_receiver())
+        twilio_task = asyncio.create_task(twilio_receiver(), name="twilio_receiver")
         
         # Wait for caller info before setting up Deepgram
         await caller_info_ready.wait()
         
-        # Now load database context with caller info
-        ai_prompt = VOICE_AGENT_PERSONALITY  # Start with base prompt
+        # Start the Deepgram handshake now so the TLS/websocket round trips overlap
+        # the context load below - only the Settings message needs the prompt
+        sts_handshake = asyncio.ensure_future(sts_connect())
         
-        if db and caller_phone != 'unknown':
-            try:
-                print(f"🔍 DEBUG: Loading context for {caller_phone}")
-                caller_data = await db.get_or_create_caller(caller_phone, call_sid or "websocket-call")
-                session_id = caller_data['session_id']
-                caller_context = caller_data['context']
-                
-                print(f"💾 Loaded caller context - Session {caller_data['session_number']}")
-                
-                if caller_data['context']['recent_sessions']:
-                    print(f"📚 Found {len(caller_data['context']['recent_sessions'])} previous sessions")
+        try:
+            # Now load database context with caller info
+            ai_prompt = VOICE_AGENT_PERSONALITY  # Start with base prompt
+            
+            if db and caller_phone != 'unknown':
+                try:
+                    log.debug("🔍 Loading context for %s", caller_phone)
+                    caller_data = await db.get_or_create_caller(caller_phone, call_sid or "websocket-call")
+                    invalidate_session_list(caller_phone)  # Call setup just added a session row
+                    session_id = caller_data['session_id']
+                    caller_context = caller_data['context']
                     
-                    # Format ACTUAL conversation content instead of generic summaries
-                    actual_context = format_actual_conversation_context(caller_data['context']['recent_sessions'])
+                    log.info("💾 Loaded caller context - Session %s", caller_data['session_number'])
                     
-                    if actual_context:
-                        # Update AI prompt with REAL conversation history
-                        ai_prompt = f"""{VOICE_AGENT_PERSONALITY}
+                    if caller_data['context']['recent_sessions']:
+                        log.info("📚 Found %s previous sessions", len(caller_data['context']['recent_sessions']))
+                        
+                        # Format ACTUAL conversation content instead of generic summaries. The database
+                        # hands back the same context object while it is cached, so reuse the prompt built from it
+                        cached_prompt = va_context_cache.get(caller_phone)
+                        if cached_prompt and cached_prompt[0] is caller_data['context']:
+                            ai_prompt = cached_prompt[1]
+                        else:
+                            actual_context = format_actual_conversation_context(caller_data['context']['recent_sessions'])
+                            if actual_context:
+                                # Update AI prompt with REAL conversation history
+                                ai_prompt = f"""{VOICE_AGENT_PERSONALITY}
 
 {actual_context}
 
 Remember: Only refer to what this caller actually said in previous conversations. If you're unsure about details, ask them to remind you instead of guessing."""
+                            va_context_cache.put(caller_phone, (caller_data['context'], ai_prompt))
                         
-                        print(f"🧠 AI prompt enhanced with ACTUAL conversation content")
-                    
-            except Exception as e:
-                print(f"❌ Database error: {e}")
-
-        # Check for human guidance
-        if session_id and session_id in human_guidance_queue:
-            guidance = human_guidance_queue[session_id]
-            ai_prompt += f"\n\nHUMAN GUIDANCE: {guidance['guidance']}"
-            print(f"👤 Including human guidance: {guidance['guidance']}")
-            del human_guidance_queue[session_id]
+                        if ai_prompt is not VOICE_AGENT_PERSONALITY:
+                            log.info("🧠 AI prompt enhanced with ACTUAL conversation content")
+                
+                except Exception as e:
+                    log.error("❌ Database error: %s", e)
+
+            # Check for human guidance
+            if session_id and session_id in human_guidance_queue:
+                guidance = human_guidance_queue[session_id]
+                ai_prompt += f"\n\nHUMAN GUIDANCE: {guidance['guidance']}"
+                log.info("👤 Including human guidance: %s", guidance['guidance'])
+                del human_guidance_queue[session_id]
+        except BaseException:
+            # Deepgram will never be used for this call - don't leak the socket
+            log.info("🔌 Call setup failed - discarding Deepgram handshake")
+            await discard_sts_handshake(sts_handshake)
+            raise
 
         # NOW set up Deepgram with the complete AI prompt
-        async with sts_connect() as sts_ws:
+        async with sts_session(sts_handshake) as sts_ws:
             # Send configuration to Deepgram with complete prompt including context
-            config_message = {
-                "type": "Settings",
-                "audio": {
-                    "input": {
-                        "encoding": "mulaw",
-                        "sample_rate": 8000,
-                    },
-                    "output": {
-                        "encoding": "mulaw",
-                        "sample_rate": 8000,
-                        "container": "none",
-                    },
-                },
-                "agent": {
-                    "language": "en",
-                    "listen": {
-                        "provider": {
-                            "type": "deepgram",
-                            "model": "nova-3"
-                        }
-                    },
-                    "think": {
-                        "provider": {
-                            "type": "open_ai",
-                            "model": LLM_MODEL,
-                            "temperature": LLM_TEMPERATURE
-                        },
-                        "prompt": ai_prompt
-                    },
-                    "speak": {
-                        "provider": {
-                            "type": "deepgram",
-                            "model": VOICE_MODEL
-                        }
-                    },
-                    "greeting": "Hello! How can I help you today?"
-                }
-            }
-
-            await sts_ws.send(json.dumps(config_message))
-            print("⚙️ Configuration sent to Deepgram with caller context")
+            # (only the prompt varies per call - the rest is serialized once at import)
+            await sts_ws.send(build_settings_message(ai_prompt))
+            log.info("⚙️ Configuration sent to Deepgram with caller context")
 
             async def sts_sender():
                 """Send audio from Twilio to Deepgram"""
-                print("🎤 sts_sender started")
+                nonlocal audio_waiter
+                log.debug("🎤 sts_sender started")
+                # Sleep until audio arrives, the call ends or the server shuts down - no polling.
+                # The waiter is a bare Future, so parking costs no Task per wakeup
+                loop = asyncio.get_running_loop()
+                shutdown_wait = asyncio.create_task(shutdown_event.wait())
+                stop_waits = {shutdown_wait, twilio_task}
+                done = set()
                 try:
-                    while not shutdown_event.is_set():
-                        try:
-                            chunk = await asyncio.wait_for(audio_queue.get(), timeout=1.0)
-                            await sts_ws.send(chunk)
-                        except asyncio.TimeoutError:
+                    while True:
+                        if not audio_queue:
+                            audio_waiter = loop.create_future()
+                            done, _ = await asyncio.wait(
+                                {audio_waiter, *stop_waits},
+                                return_when=asyncio.FIRST_COMPLETED
+                            )
+                            audio_waiter = None
+                        while audio_queue:
+                            # Coalesce whatever queued up while we were sending into one frame
+                            batch = [audio_queue.popleft()]
+                            batch_len = len(batch[0])
+                            while audio_queue and batch_len + len(audio_queue[0]) <= DEEPGRAM_SEND_MAX_BYTES:
+                                chunk = audio_queue.popleft()
+                                batch.append(chunk)
+                                batch_len += len(chunk)
+                            await sts_ws.send(batch[0] if len(batch) == 1 else b"".join(batch))
+                        if not done.isdisjoint(stop_waits):
+                            break
+                except Exception as e:
+                    log.error("Error in sts_sender: %s", e)
+                finally:
+                    shutdown_wait.cancel()
+                    # Twilio leg is gone (or we are shutting down) - close Deepgram too so
+                    # sts_receiver and the tasks behind it finish instead of holding the socket
+                    await sts_ws.close()
+
+            # Control-plane text from Deepgram (transcripts, events) is handled off the
+            # audio path so a slow dashboard or parse never delays the next audio frame
+            control_queue = asyncio.Queue()
+
+            async def sts_control_handler():
+                """Handle Deepgram text messages: store transcripts, update dashboards"""
+                while True:
+                    message = await control_queue.get()
+                    if message is None:
+                        break
+                    try:
+                        decoded = orjson.loads(message)
+                        
+                        # Store conversation messages in database
+                        if decoded.get('type') == 'ConversationText' and session_id and db:
+                            role = decoded.get('role')
+                            content = decoded.get('content')
+                            if role and content:
+                                try:
+                                    # Map Deepgram roles to database-compatible roles
+                                    db_role = 'ai' if role == 'assistant' else role
+                                    await db.add_message(session_id, db_role, content, decoded)
+                                    log.debug("💬 Stored message: %s - %s...", db_role, content[:50])
+                                    
+                                except Exception as e:
+                                    log.error("Error storing message: %s", e)
+                                
+                                # Broadcast to dashboard (outside database transaction)
+                                try:
+                                    await broadcast_to_dashboards({
+                                        'type': 'transcript_update',
+                                        'session_id': str(session_id),      # <-- Convert UUID to string
+                                        'call_sid': call_sid,
+                                        'role': db_role,
+                                        'content': content,
+                                        'timestamp': time.time()
+                                    })
+                                except Exception as e:
+                                    log.error("Error broadcasting to dashboard: %s", e)
+                    except orjson.JSONDecodeError:
+                        log.error("Could not decode message: %s", message)
+
+            # Deepgram audio waiting to go out to Twilio. sts_receiver only queues it;
+            # twilio_sender owns every write to Twilio so barge-in clears stay ordered
+            twilio_out = deque()
+            twilio_out_waiter = None
+            twilio_clear_pending = False
+            twilio_out_closed = False
+            twilio_sender_done = False
+
+            def wake_twilio_sender():
+                if twilio_out_waiter is not None and not twilio_out_waiter.done():
+                    twilio_out_waiter.set_result(None)
+
+            async def twilio_sender():
+                """Send Deepgram audio to Twilio, one media frame per batch"""
+                nonlocal twilio_out_waiter, twilio_clear_pending, twilio_sender_done
+                loop = asyncio.get_running_loop()
+                try:
+                    # Wait for stream ID from Twilio
+                    streamsid = await streamsid_future
+                    log.debug("🌊 Got stream ID: %s", streamsid)
+                    
+                    # Outbound frames only differ by payload once the stream is known,
+                    # so build the JSON envelope and the barge-in message once
+                    media_prefix = b'{"event":"media","streamSid":"' + streamsid.encode() + b'","media":{"payload":"'
+                    media_suffix = b'"}}'
+                    clear_message = orjson.dumps({
+                        "event": "clear",
+                        "streamSid": streamsid
+                    }).decode()
+                    
+                    while True:
+                        if twilio_clear_pending:
+                            twilio_clear_pending = False
+                            await ws.send_str(clear_message)
+                        if twilio_out:
+                            # TTS arrives faster than real time - merge whatever queued up
+                            # while the last frame was being sent instead of one send per chunk
+                            batch = [twilio_out.popleft()]
+                            batch_len = len(batch[0])
+                            while twilio_out and batch_len + len(twilio_out[0]) <= TWILIO_SEND_MAX_BYTES:
+                                chunk = twilio_out.popleft()
+                                batch.append(chunk)
+                                batch_len += len(chunk)
+                            payload = batch[0] if len(batch) == 1 else b"".join(batch)
+                            media_message = media_prefix + pybase64.b64encode(payload) + media_suffix
+                            await ws.send_str(media_message.decode("ascii"))
                             continue
+                        if twilio_out_closed:
+                            break
+                        twilio_out_waiter = loop.create_future()
+                        await twilio_out_waiter
+                        twilio_out_waiter = None
+                        
                 except Exception as e:
-                    print(f"Error in sts_sender: {e}")
+                    log.error("Error in twilio_sender: %s", e)
+                finally:
+                    # Nothing will drain the queue any more - drop it and stop sts_receiver filling it
+                    twilio_sender_done = True
+                    twilio_out.clear()
 
             async def sts_receiver():
-                """Receive audio from Deepgram and send to Twilio"""
-                print("🔊 sts_receiver started")
+                """Receive audio from Deepgram and queue it for Twilio"""
+                nonlocal twilio_clear_pending, twilio_out_closed
+                log.debug("🔊 sts_receiver started")
                 try:
-                    # Wait for stream ID from Twilio
-                    streamsid = await streamsid_queue.get()
-                    print(f"🌊 Got stream ID: {streamsid}")
-                    
                     async for message in sts_ws:
                         if shutdown_event.is_set():
                             break
                             
                         if type(message) is str:
-                            print(f"📨 Deepgram message: {message}")
-                            try:
-                                decoded = json.loads(message)
-                                
-                                # Store conversation messages in database
-                                if decoded.get('type') == 'ConversationText' and session_id and db:
-                                    role = decoded.get('role')
-                                    content = decoded.get('content')
-                                    if role and content:
-                                        try:
-                                            # Map Deepgram roles to database-compatible roles
-                                            db_role = 'ai' if role == 'assistant' else role
-                                            await db.add_message(session_id, db_role, content, decoded)
-                                            print(f"💬 Stored message: {db_role} - {content[:50]}...")
-                                            
-                                        except Exception as e:
-                                            print(f"Error storing message: {e}")
-                                        
-                                        # Broadcast to dashboard (outside database transaction)
-                                        try:
-                                            await broadcast_to_dashboards({
-                                                'type': 'transcript_update',
-                                                'session_id': str(session_id),      # <-- Convert UUID to string
-                                                'call_sid': call_sid,
-                                                'role': db_role,
-                                                'content': content,
-                                                'timestamp': time.time()
-                                            })
-                                        except Exception as e:
-                                            print(f"Error broadcasting to dashboard: {e}")
-                                            
-                                                                       
-                                if decoded['type'] == 'UserStartedSpeaking':
-                                    # Handle barge-in
-                                    clear_message = {
-                                        "event": "clear",
-                                        "streamSid": streamsid
-                                    }
-                                    await ws.send_str(json.dumps(clear_message))
-                            except json.JSONDecodeError:
-                                print(f"Could not decode message: {message}")
+                            # Handle barge-in right here - drop audio Twilio hasn't got yet
+                            # and have twilio_sender stop what is already playing
+                            if '"UserStartedSpeaking"' in message and is_user_started_speaking(message):
+                                twilio_out.clear()
+                                twilio_clear_pending = True
+                                wake_twilio_sender()
+                            control_queue.put_nowait(message)
                             continue
 
                         # Handle binary audio data
-                        if isinstance(message, bytes):
-                            media_message = {
-                                "event": "media",
-                                "streamSid": streamsid,
-                                "media": {"payload": base64.b64encode(message).decode("ascii")},
-                            }
-                            await ws.send_str(json.dumps(media_message))
+                        if isinstance(message, bytes) and not twilio_sender_done:
+                            twilio_out.append(message)
+                            wake_twilio_sender()
 
                 except Exception as e:
-                    print(f"Error in sts_receiver: {e}")
-
-            # Run Deepgram tasks with the already-running Twilio task
+                    log.error("Error in sts_receiver: %s", e)
+                finally:
+                    control_queue.put_nowait(None)  # Let the control handler finish
+                    twilio_out_closed = True  # Let twilio_sender drain and finish
+                    wake_twilio_sender()
+
+            # Run Deepgram tasks with the already-running Twilio task.
+            # Every task logs its own errors, so gather only has to wait for them
             await asyncio.gather(
-                sts_sender(),
-                sts_receiver(),
+                asyncio.create_task(sts_sender(), name="sts_sender"),
+                asyncio.create_task(sts_receiver(), name="sts_receiver"),
+                asyncio.create_task(twilio_sender(), name="twilio_sender"),
+                asyncio.create_task(sts_control_handler(), name="sts_control_handler"),
                 twilio_task,
                 return_exceptions=True
             )
 
+            # The call's session is finished - cached session lists for this caller are stale
+            if caller_phone:
+                invalidate_session_list(caller_phone)
+
             # Fallback: if the call ended without a clean 'stop' event,
             # make sure it is moved to inactive clients.
             if call_sid:
@@ -1553,7 +1828,7 @@ Remember: Only refer to what this caller actually said in previous conversations
 
 
     except Exception as e:
-        print(f"Error in twilio_handler: {e}")
+        log.error("Error in twilio_handler: %s", e)
 
 async def health_check(request):
     """HTTP health check endpoint for Railway"""
@@ -1574,6 +1849,20 @@ async def root_handler(request):
         headers={'Content-Type': 'text/plain'}
     )
 
+def setup_logging():
+    """Route log records through a queue so stdout writes happen off the event loop"""
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter("%(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    
+    # Only our own logger - library loggers (aiohttp.access etc.) keep their defaults
+    log.addHandler(logging.handlers.QueueHandler(log_queue))
+    log.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    log.propagate = False
+    listener.start()
+    return listener
+
 def setup_signal_handlers():
     """Setup signal handlers - ignore SIGTERM from Railway"""
     def ignore_sigterm(signum, frame):
@@ -1607,13 +1896,17 @@ async def create_app():
     # Middleware for request logging
     @web.middleware
     async def logging_middleware(request, handler):
-        print(f"🌐 Request: {request.method} {request.path} from {request.remote}")
+        # Railway probes /health every few seconds - don't log those at all
+        if request.path == '/health':
+            return await handler(request)
+        # Per-request lines are debug output (LOG_LEVEL=DEBUG); failures are always logged
+        log.debug("🌐 Request: %s %s from %s", request.method, request.path, request.remote)
         try:
             response = await handler(request)
-            print(f"✅ Response: {request.method} {request.path} -> {response.status}")
+            log.debug("✅ Response: %s %s -> %s", request.method, request.path, response.status)
             return response
         except Exception as e:
-            print(f"❌ Error handling {request.method} {request.path}: {e}")
+            log.error("❌ Error handling %s %s: %s", request.method, request.path, e)
             raise
     
     app.middlewares.append(logging_middleware)
@@ -1639,6 +1932,8 @@ async def create_app():
 
 def main():
     """Main entry point"""
+    log_listener = setup_logging()
+    
     # Get port from environment (Railway sets this automatically)
     port = int(os.environ.get("PORT", 5000))
     
@@ -1651,7 +1946,7 @@ def main():
     print(f"📡 Dashboard WebSocket: ws://0.0.0.0:{port}/dashboard-ws")
     
     # Check for required environment variables
-    if not os.getenv('DEEPGRAM_API_KEY'):
+    if not DEEPGRAM_API_KEY:
         print("⚠️ WARNING: DEEPGRAM_API_KEY not found in environment variables")
     else:
         print("✅ DEEPGRAM_API_KEY found in environment")
@@ -1660,6 +1955,9 @@ def main():
         # Initialize database first
         await initialize_database()
         
+        # Keep active_sessions bounded even when calls never reach a 'stop' event
+        prune_task = asyncio.create_task(prune_active_sessions())
+        
         # Create the web application
         app = await create_app()
         
@@ -1681,16 +1979,32 @@ def main():
         
         # Keep the server running
         try:
-            while not shutdown_event.is_set():
-                await asyncio.sleep(1)
+            await shutdown_event.wait()
         except asyncio.CancelledError:
             pass
         
+        prune_task.cancel()
+        
+        # Don't lose transcript lines still waiting in the write buffer
+        if db:
+            await db.close()
+        
         print("Server shutdown complete")
 
+    # uvloop (libuv) schedules the websocket relay and asyncpg I/O faster than the default loop.
+    # uvloop.run() creates the loop directly instead of going through the deprecated policy API
+    run = asyncio.run
+    if sys.platform != 'win32':
+        try:
+            import uvloop
+            run = uvloop.run
+            print("⚡ Using uvloop event loop")
+        except ImportError:
+            print("⚠️ uvloop not installed - using default asyncio event loop")
+
     try:
         # Run the server
-        asyncio.run(run_server())
+        run(run_server())
     except KeyboardInterrupt:
         print("Server interrupted by user")
     except Exception as e:
@@ -1698,6 +2012,8 @@ def main():
         import traceback
         traceback.print_exc()
         return 1
+    finally:
+        log_listener.stop()  # Flush queued log records
     
     return 0
 